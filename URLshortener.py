@@ -1,8 +1,14 @@
-from fastapi import FastAPI, HTTPException, status, Request, Query
+from fastapi import FastAPI, HTTPException, status, Request, Query, Depends
+from fastapi.responses import RedirectResponse
+from starlette.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
-from datetime import datetime, timedelta
-import psycopg2
-import random
+from datetime import datetime
+import asyncio
+import time
+import json
+import asyncpg
+from cachetools import TTLCache
+import secrets
 import string
 import os
 from dotenv import load_dotenv
@@ -12,12 +18,48 @@ load_dotenv()
 app = FastAPI()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))
+
+app.state.base_url = os.getenv("BASE_URL", "").rstrip('/') or None
+
+# Hosts aceitos no cabeçalho Host (ex.: "encurta.exemplo.com,localhost");
+# requisições para outros hosts recebem 400 do TrustedHostMiddleware
+ALLOWED_HOSTS = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "").split(",") if h.strip()]
+if ALLOWED_HOSTS:
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=ALLOWED_HOSTS)
+
+# short_path -> (id, original_url, prazo em time.monotonic() ou None); o TTL
+# limita quanto tempo outros workers podem servir um mapeamento alterado ou removido
+url_cache = TTLCache(maxsize=100_000, ttl=60)
+
+SHORT_PATH_ALPHABET = string.ascii_lowercase + string.digits
+SHORT_PATH_LENGTH = 6
+
+INT4_MAX = 2**31 - 1
+
+# Por quanto tempo navegadores/CDN podem reutilizar um redirecionamento 301
+REDIRECT_CACHE_SECONDS = 86_400
+
+LOG_BATCH_SIZE = 500
+LOG_QUEUE_SIZE = 10_000
+LOG_FLUSH_SECONDS = 0.1
+LOG_SHUTDOWN_SECONDS = 10
+# Sentinela enfileirada no shutdown; o drainer grava o que veio antes e termina
+LOG_STOP = object()
+
+# Falhas de banco que as tarefas de fundo registram e toleram: erros do servidor,
+# conexões derrubadas (InterfaceError), falhas de rede ao reconectar e timeouts
+BACKGROUND_DB_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError)
+
+STATS_REFRESH_SECONDS = int(os.getenv("STATS_REFRESH_SECONDS", "60"))
+# Chave do advisory lock que impede workers de atualizarem a view ao mesmo tempo
+STATS_REFRESH_LOCK = 7_300_001
 
 
 class PaginatedURLResponse(BaseModel):
     total_items: int
-    page: int
     per_page: int
+    next_cursor: Optional[str] = None
     items: List[dict]
 
 class URLCreate(BaseModel):
@@ -28,46 +70,191 @@ class URLCreate(BaseModel):
 class URLUpdate(BaseModel):
     original_url: str
 
-def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+@app.on_event("startup")
+async def startup():
+    if app.state.base_url is None:
+        print(
+            "Aviso: BASE_URL não definida; as URLs curtas usarão o cabeçalho Host "
+            "de cada requisição. Defina BASE_URL em produção."
+        )
+    # Cada conexão prepara uma consulta uma vez e reutiliza o plano. Atrás do
+    # PgBouncer em modo transaction isso exige max_prepared_statements > 0;
+    # use DB_STATEMENT_CACHE_SIZE=0 com PgBouncer < 1.21.
+    app.state.pool = await asyncpg.create_pool(
+        DATABASE_URL, min_size=5, max_size=20,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE
+    )
+    app.state.log_queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+    app.state.access_logs_written = 0
+    app.state.access_logs_dropped = 0
+    app.state.log_drainer = asyncio.create_task(drain_access_logs())
+    app.state.stats_refresher = asyncio.create_task(refresh_url_stats())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_task(app.state.stats_refresher)
+    await stop_log_drainer()
+    await app.state.pool.close()
+
+async def stop_task(task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        print(f"Tarefa de fundo {task.get_name()} terminou com erro: {e!r}")
+
+async def stop_log_drainer():
+    drainer = app.state.log_drainer
+    try:
+        await asyncio.wait_for(finish_log_drainer(), LOG_SHUTDOWN_SECONDS)
+    except asyncio.TimeoutError:
+        lost = app.state.log_queue.qsize()
+        app.state.access_logs_dropped += lost
+        print(
+            f"Drainer não terminou em {LOG_SHUTDOWN_SECONDS}s; {lost} registros de "
+            "acesso na fila descartados, além do lote em gravação"
+        )
+    except Exception as e:
+        print(f"Tarefa de fundo {drainer.get_name()} terminou com erro: {e!r}")
+
+async def finish_log_drainer():
+    # A sentinela entra depois de tudo que já está na fila, então o drainer
+    # grava esses registros e o lote em andamento antes de sair
+    if not app.state.log_drainer.done():
+        await app.state.log_queue.put(LOG_STOP)
+    await app.state.log_drainer
+
+def fill_log_batch(batch):
+    queue = app.state.log_queue
+    while len(batch) < LOG_BATCH_SIZE and batch[-1] is not LOG_STOP and not queue.empty():
+        batch.append(queue.get_nowait())
+    return batch
+
+async def write_access_logs(batch):
+    try:
+        url_ids, ips, user_agents = zip(*batch)
+        async with app.state.pool.acquire() as conn:
+            # O JOIN descarta acessos a URLs já removidas (que fariam o lote
+            # inteiro falhar na FK) e o FOR KEY SHARE impede que sejam removidas
+            # durante o INSERT. accessed_at fica com o DEFAULT NOW() da coluna.
+            result = await conn.execute(
+                """INSERT INTO access_logs (url_id, ip_address, user_agent)
+                   SELECT l.url_id, l.ip_address, l.user_agent
+                   FROM unnest($1::int[], $2::text[], $3::text[])
+                        AS l(url_id, ip_address, user_agent)
+                   JOIN urls u ON u.id = l.url_id
+                   FOR KEY SHARE OF u""",
+                url_ids, ips, user_agents
+            )
+        written = int(result.split()[-1])
+        app.state.access_logs_written += written
+        app.state.access_logs_dropped += len(batch) - written
+    except BACKGROUND_DB_ERRORS as e:
+        app.state.access_logs_dropped += len(batch)
+        print(f"Erro ao gravar {len(batch)} registros de acesso: {e!r}")
+
+async def drain_access_logs():
+    queue = app.state.log_queue
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        # Espera até LOG_FLUSH_SECONDS para completar o lote
+        deadline = loop.time() + LOG_FLUSH_SECONDS
+        while True:
+            fill_log_batch(batch)
+            if batch[-1] is LOG_STOP or len(batch) >= LOG_BATCH_SIZE:
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        stopping = batch[-1] is LOG_STOP
+        if stopping:
+            batch.pop()
+        if batch:
+            await write_access_logs(batch)
+        if stopping:
+            return
+
+async def refresh_url_stats():
+    while True:
+        await asyncio.sleep(STATS_REFRESH_SECONDS)
+        try:
+            async with app.state.pool.acquire() as conn, conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", STATS_REFRESH_LOCK):
+                    continue
+                # Cada worker roda este laço; com o lock em mãos, só atualiza se
+                # nenhum outro worker já o fez dentro do intervalo
+                recent = await conn.fetchval(
+                    """SELECT refreshed_at > NOW() - make_interval(secs => $1)
+                       FROM mv_url_stats_refreshed_at""",
+                    STATS_REFRESH_SECONDS
+                )
+                if recent:
+                    continue
+                await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_url_stats")
+                await conn.execute(
+                    """INSERT INTO mv_url_stats_refreshed_at (id, refreshed_at)
+                       VALUES (TRUE, NOW())
+                       ON CONFLICT (id) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at"""
+                )
+        except BACKGROUND_DB_ERRORS as e:
+            print(f"Erro ao atualizar mv_url_stats: {e!r}")
 
 def generate_short_path():
-    chars = string.ascii_lowercase + string.digits
-    return ''.join(random.choice(chars) for _ in range(6))
+    # Um único sorteio criptográfico, codificado em base 36
+    n = secrets.randbelow(len(SHORT_PATH_ALPHABET) ** SHORT_PATH_LENGTH)
+    chars = []
+    for _ in range(SHORT_PATH_LENGTH):
+        n, i = divmod(n, len(SHORT_PATH_ALPHABET))
+        chars.append(SHORT_PATH_ALPHABET[i])
+    return ''.join(chars)
+
+async def get_base_url(request: Request) -> str:
+    if app.state.base_url is not None:
+        return app.state.base_url
+    # Sem BASE_URL a base é derivada a cada requisição e nunca guardada: o
+    # TrustedHostMiddleware não valida a porta, então um Host forjado não
+    # pode afetar as respostas de outras requisições
+    return str(request.base_url).rstrip('/')
 
 # Rotas
 @app.get("/healthcheck")
-def healthcheck():
-    return {"status": "ok"}
+async def healthcheck():
+    return {
+        "status": "ok",
+        "access_logs_written": app.state.access_logs_written,
+        "access_logs_dropped": app.state.access_logs_dropped
+    }
 
 @app.post("/api/urls", status_code=status.HTTP_201_CREATED)
-def create_url(data: URLCreate, request: Request):
+async def create_url(data: URLCreate, base_url: str = Depends(get_base_url)):
     
-    base_url = str(request.base_url).rstrip('/')
     short_path = data.short_path or generate_short_path()
-    expires_at = None
-
-    if data.expires_in_days is not None:  
-        expires_at = datetime.now() + timedelta(days=data.expires_in_days)
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        async with app.state.pool.acquire() as conn:
+            # expires_at é calculado pelo relógio do banco; NULL dias -> sem expiração
+            result = await conn.fetchrow(
+                """INSERT INTO urls (original_url, short_path, expires_at)
+                   VALUES ($1, $2, NOW() + $3::float8 * INTERVAL '1 day')
+                   ON CONFLICT (short_path) DO NOTHING
+                   RETURNING id, created_at, expires_at""",
+                data.original_url, short_path, data.expires_in_days
+            )
         
-        cur.execute("SELECT 1 FROM urls WHERE short_path = %s", (short_path,))
-        if cur.fetchone():
+        if not result:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail=f"O caminho '{short_path}' já está em uso"
             )
         
-        cur.execute(
-            """INSERT INTO urls (original_url, short_path, expires_at)
-               VALUES (%s, %s, %s) RETURNING id, created_at""",
-            (data.original_url, short_path, expires_at)
-        )
-        url_id, created_at = cur.fetchone()
-        conn.commit()
+        url_id, created_at, expires_at = result
         
         return {
             "id": url_id,
@@ -77,143 +264,129 @@ def create_url(data: URLCreate, request: Request):
             "expires_at": expires_at
         }
         
-    except psycopg2.Error as e:
+    except asyncpg.PostgresError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro no banco de dados: {e}"
         )
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @app.put("/api/urls/{short_path}")
-def update_url(short_path: str, data: URLUpdate, request: Request):
-    base_url = str(request.base_url).rstrip('/')
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute(
-            """UPDATE urls SET original_url = %s, updated_at = NOW()
-               WHERE short_path = %s RETURNING id, original_url""",
-            (data.original_url, short_path)
+async def update_url(short_path: str, data: URLUpdate, base_url: str = Depends(get_base_url)):
+    async with app.state.pool.acquire() as conn:
+        result = await conn.fetchrow(
+            """UPDATE urls SET original_url = $1, updated_at = NOW()
+               WHERE short_path = $2 RETURNING id, original_url, updated_at""",
+            data.original_url, short_path
         )
-        result = cur.fetchone()
         
-        if not result:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="URL não encontrada"
-            )
+    url_cache.pop(short_path, None)
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="URL não encontrada"
+        )
         
-        conn.commit()
-        return {
-            "id": result[0],
-            "short_url": f"{base_url}/{short_path}",
-            "original_url": result[1],
-            "updated_at": datetime.now()
-        }
-    finally:
-        if 'conn' in locals():
-            conn.close()
+    return {
+        "id": result["id"],
+        "short_url": f"{base_url}/{short_path}",
+        "original_url": result["original_url"],
+        "updated_at": result["updated_at"]
+    }
 
 @app.get("/{short_path}")
 async def redirect_url(short_path: str, request: Request):
-    conn = None
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT id, original_url, expires_at 
-            FROM urls 
-            WHERE short_path = %s
-            FOR UPDATE""", (short_path,))
-        
-        url_data = cur.fetchone()
+    url_data = url_cache.get(short_path)
+    if url_data is None:
+        try:
+            async with app.state.pool.acquire() as conn:
+                # Segundos até expirar medidos pelo relógio do banco, o mesmo
+                # que gravou expires_at; NULL quando a URL não expira
+                url_data = await conn.fetchrow("""
+                    SELECT id, original_url,
+                           EXTRACT(EPOCH FROM expires_at - LOCALTIMESTAMP)::float8 AS expires_in
+                    FROM urls 
+                    WHERE short_path = $1""", short_path)
+        except asyncpg.PostgresError:
+            raise HTTPException(status_code=500, detail="Erro interno ao processar o acesso")
         
         if not url_data:
             raise HTTPException(status_code=404, detail="URL não encontrada")
         
-        url_id, original_url, expires_at = url_data
-        
-        if expires_at and expires_at < datetime.now():
-            raise HTTPException(status_code=410, detail="URL expirada")
-        
-        cur.execute("""
-            INSERT INTO access_logs 
-            (url_id, accessed_at, ip_address, user_agent) 
-            VALUES (%s, NOW(), %s, %s)
-            RETURNING id""",
-            (
-                url_id,
-                request.client.host,
-                request.headers.get("user-agent"),
-            ))
-        
-        log_id = cur.fetchone()[0]
-        conn.commit()
-        
-        print(f"Registro de acesso criado - ID: {log_id}, URL: {short_path}")
-        
-        return {"redirect_to": original_url}
-        
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise HTTPException(status_code=500, detail="Erro interno ao processar o acesso")
-    finally:
-        if conn:
-            conn.close()
+        url_id, original_url, expires_in = url_data
+        # Prazo absoluto no relógio monotônico, válido enquanto estiver no cache
+        deadline = None if expires_in is None else time.monotonic() + expires_in
+        url_data = (url_id, original_url, deadline)
+        url_cache[short_path] = url_data
+    
+    url_id, original_url, deadline = url_data
+    remaining = None if deadline is None else deadline - time.monotonic()
+    
+    if remaining is not None and remaining <= 0:
+        raise HTTPException(status_code=410, detail="URL expirada")
+    
+    # O registro de acesso é gravado em lote pelo drain_access_logs
+    try:
+        app.state.log_queue.put_nowait((
+            url_id,
+            request.client.host,
+            request.headers.get("user-agent"),
+        ))
+    except asyncio.QueueFull:
+        app.state.access_logs_dropped += 1
+    
+    # URLs que não expiram dentro da janela de cache viram 301 cacheável;
+    # as demais usam 302 para não serem servidas depois de expirarem
+    if remaining is None or remaining >= REDIRECT_CACHE_SECONDS:
+        return RedirectResponse(
+            url=original_url,
+            status_code=status.HTTP_301_MOVED_PERMANENTLY,
+            headers={"Cache-Control": f"public, max-age={REDIRECT_CACHE_SECONDS}"}
+        )
+    return RedirectResponse(url=original_url, status_code=status.HTTP_302_FOUND)
 
 @app.get("/api/urls/{short_path}/stats")
-def get_stats(short_path: str, request: Request):
-    conn = None
+async def get_stats(short_path: str, base_url: str = Depends(get_base_url)):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        base_url = str(request.base_url).rstrip('/')
-        
-        cur.execute(
-            """SELECT id, original_url FROM urls 
-               WHERE short_path = %s""",
-            (short_path,)
-        )
-        url_data = cur.fetchone()
+        async with app.state.pool.acquire() as conn:
+            stats = await conn.fetchrow(
+                """WITH u AS (
+                       SELECT id, original_url FROM urls WHERE short_path = $1
+                   ),
+                   counts AS (
+                       SELECT
+                           COALESCE(MAX(total_accesses), 0) AS total_accesses,
+                           COALESCE(MAX(last_30_days), 0) AS last_30_days
+                       FROM mv_url_stats
+                       WHERE url_id = (SELECT id FROM u)
+                   ),
+                   recent AS (
+                       SELECT json_agg(r) AS logs FROM (
+                           SELECT accessed_at, ip_address, user_agent
+                           FROM access_logs
+                           WHERE url_id = (SELECT id FROM u)
+                           ORDER BY accessed_at DESC
+                           LIMIT 10
+                       ) r
+                   )
+                   SELECT u.original_url, counts.total_accesses, counts.last_30_days, recent.logs
+                   FROM u, counts, recent""",
+                short_path
+            )
         
-        if not url_data:
+        if not stats:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="URL não encontrada"
             )
         
-        url_id, original_url = url_data
-        
-        cur.execute(
-            """SELECT 
-                  COUNT(*) as total_accesses,
-                  COUNT(CASE WHEN accessed_at >= NOW() - INTERVAL '30 days' THEN 1 END) as last_30_days
-               FROM access_logs 
-               WHERE url_id = %s""",
-            (url_id,)
-        )
-        counts = cur.fetchone()
-        total_accesses, accesses_last_30_days = counts if counts else (0, 0)
+        original_url, total_accesses, accesses_last_30_days, logs = stats
         
-        cur.execute(
-            """SELECT accessed_at, ip_address, user_agent
-               FROM access_logs
-               WHERE url_id = %s
-               ORDER BY accessed_at DESC
-               LIMIT 10""",
-            (url_id,)
-        )
+        # json_agg já serializa accessed_at em ISO 8601 (sem fuso)
         access_logs = [{
-            "accessed_at": log[0].isoformat() + "Z", 
-            "ip_address": log[1],
-            "user_agent": log[2]
-        } for log in cur.fetchall()]
+            "accessed_at": log["accessed_at"] + "Z", 
+            "ip_address": log["ip_address"],
+            "user_agent": log["user_agent"]
+        } for log in json.loads(logs or "[]")]
         
         return {
             "short_url": f"{base_url}/{short_path}",
@@ -223,93 +396,106 @@ def get_stats(short_path: str, request: Request):
             "access_logs": access_logs
         }
         
-    except psycopg2.Error as e:
+    except asyncpg.PostgresError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro no banco de dados: {str(e)}"
         )
-    finally:
-        if conn:
-            conn.close()
 
 @app.delete("/api/urls/{short_path}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_url(short_path: str):
+async def delete_url(short_path: str):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM urls WHERE short_path = %s", (short_path,))
-        url_data = cur.fetchone()
+        # access_logs é removido junto via ON DELETE CASCADE
+        async with app.state.pool.acquire() as conn:
+            url_id = await conn.fetchval(
+                "DELETE FROM urls WHERE short_path = $1 RETURNING id", short_path
+            )
         
-        if not url_data:
+        url_cache.pop(short_path, None)
+        if url_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="URL não encontrada"
             )
-        
-        url_id = url_data[0]
-        
-        cur.execute("DELETE FROM access_logs WHERE url_id = %s", (url_id,))
-        cur.execute("DELETE FROM urls WHERE id = %s", (url_id,))
-        conn.commit()
         return None
         
-    except psycopg2.Error as e:
-        conn.rollback()
+    except asyncpg.PostgresError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro no banco de dados: {e}"
         )
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def parse_cursor(cursor: str):
+    # Formato "<created_at ISO 8601>,<id>", gerado por list_urls em next_cursor
+    try:
+        created_at, url_id = cursor.rsplit(",", 1)
+        created_at, url_id = datetime.fromisoformat(created_at), int(url_id)
+    except ValueError:
+        created_at, url_id = None, 0
+    # urls.created_at é TIMESTAMP sem fuso e urls.id é int4; valores fora disso
+    # só falhariam depois, na codificação dos parâmetros pelo asyncpg
+    if created_at is None or created_at.tzinfo is not None or not 0 < url_id <= INT4_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
+    return created_at, url_id
 
 @app.get("/api/urls", response_model=PaginatedURLResponse)
-def list_urls(
-    request: Request,
-    page: int = Query(1, gt=0, description="Número da página"),
-    per_page: int = Query(100, gt=0, le=100, description="Itens por página")
+async def list_urls(
+    cursor: Optional[str] = Query(None, description="Cursor da página anterior (next_cursor)"),
+    per_page: int = Query(100, gt=0, le=100, description="Itens por página"),
+    base_url: str = Depends(get_base_url)
 ):
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        base_url = str(request.base_url).rstrip('/')
-
-
-        cur.execute("SELECT COUNT(*) FROM urls")
-        total_items = cur.fetchone()[0]
-        offset = (page - 1) * per_page
-        cur.execute(
-            """SELECT id, original_url, short_path, created_at, expires_at 
-               FROM urls 
-               ORDER BY created_at DESC
-               LIMIT %s OFFSET %s""",
-            (per_page, offset)
-        )
-        
+        async with app.state.pool.acquire() as conn:
+            # Estimativa do planner; evita o COUNT(*) sobre a tabela inteira
+            total_items = await conn.fetchval(
+                "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = 'urls'::regclass"
+            )
+            if cursor is None:
+                rows = await conn.fetch(
+                    """SELECT id, original_url, short_path, created_at, expires_at 
+                       FROM urls 
+                       ORDER BY created_at DESC, id DESC
+                       LIMIT $1""",
+                    per_page
+                )
+            else:
+                last_created_at, last_id = parse_cursor(cursor)
+                rows = await conn.fetch(
+                    """SELECT id, original_url, short_path, created_at, expires_at 
+                       FROM urls 
+                       WHERE (created_at, id) < ($1, $2)
+                       ORDER BY created_at DESC, id DESC
+                       LIMIT $3""",
+                    last_created_at, last_id, per_page
+                )
+            
         items = []
-        for url in cur.fetchall():
+        for url in rows:
             items.append({
-                "id": url[0],
-                "original_url": url[1],
-                "short_url": f"{base_url}/{url[2]}",
-                "created_at": url[3],
-                "expires_at": url[4],
-                "stats_url": f"{base_url}/api/urls/{url[2]}/stats"
+                "id": url["id"],
+                "original_url": url["original_url"],
+                "short_url": f"{base_url}/{url['short_path']}",
+                "created_at": url["created_at"],
+                "expires_at": url["expires_at"],
+                "stats_url": f"{base_url}/api/urls/{url['short_path']}/stats"
             })
 
+        next_cursor = None
+        if len(rows) == per_page:
+            last = rows[-1]
+            next_cursor = f"{last['created_at'].isoformat()},{last['id']}"
+
         return {
             "total_items": total_items,
-            "page": page,
             "per_page": per_page,
+            "next_cursor": next_cursor,
             "items": items
         }
 
-    except psycopg2.Error as e:
+    except asyncpg.PostgresError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
@@ -0,0 +1,107 @@
+-- Executado pelo Postgres na primeira inicialização do volume; os comandos
+-- são idempotentes e podem ser reaplicados em bancos já existentes com psql
+-- (o arquivo usa \gexec, então precisa do psql).
+-- Os índices das tabelas são criados com CONCURRENTLY, que não bloqueia
+-- escritas; por isso o arquivo não deve ser executado dentro de uma transação
+-- (psql -1). A troca da FK de access_logs, quando necessária, ainda segura
+-- por um instante locks que bloqueiam escritas em access_logs e urls.
+
+CREATE TABLE IF NOT EXISTS urls (
+    id SERIAL PRIMARY KEY,
+    original_url TEXT NOT NULL,
+    short_path VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP,
+    expires_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS access_logs (
+    id SERIAL PRIMARY KEY,
+    url_id INTEGER NOT NULL REFERENCES urls(id) ON DELETE CASCADE,
+    accessed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    ip_address VARCHAR(45),
+    user_agent TEXT
+);
+
+-- Bancos criados antes do ON DELETE CASCADE (delete_url depende dele): troca a
+-- FK só quando ela ainda não é CASCADE. A nova FK entra NOT VALID para não
+-- varrer access_logs segurando locks que bloqueiam escritas.
+DO $$
+DECLARE
+    fk_name TEXT;
+BEGIN
+    SELECT conname INTO fk_name
+    FROM pg_constraint
+    WHERE conrelid = 'access_logs'::regclass
+      AND confrelid = 'urls'::regclass
+      AND contype = 'f'
+      AND confdeltype <> 'c';
+
+    IF fk_name IS NOT NULL THEN
+        EXECUTE format(
+            'ALTER TABLE access_logs
+                 DROP CONSTRAINT %I,
+                 ADD CONSTRAINT access_logs_url_id_fkey
+                     FOREIGN KEY (url_id) REFERENCES urls(id) ON DELETE CASCADE NOT VALID',
+            fk_name
+        );
+    END IF;
+END $$;
+
+-- Valida em separado; VALIDATE CONSTRAINT não bloqueia escritas e não faz
+-- nada quando a FK já está validada
+DO $$
+DECLARE
+    fk_name TEXT;
+BEGIN
+    FOR fk_name IN
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = 'access_logs'::regclass
+          AND confrelid = 'urls'::regclass
+          AND contype = 'f'
+          AND NOT convalidated
+    LOOP
+        EXECUTE format('ALTER TABLE access_logs VALIDATE CONSTRAINT %I', fk_name);
+    END LOOP;
+END $$;
+
+-- Um CREATE INDEX CONCURRENTLY interrompido deixa o índice INVALID, e o
+-- IF NOT EXISTS abaixo não o reconstruiria; remove essas sobras primeiro.
+-- Não reaplique o arquivo enquanto outra execução ainda cria os índices.
+SELECT format('DROP INDEX CONCURRENTLY IF EXISTS %s', i.indexrelid::regclass)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE NOT i.indisvalid
+  AND c.relname IN ('urls_short_path_uniq', 'urls_created_at_id', 'access_logs_url_ts')
+\gexec
+
+-- Necessário para o INSERT ... ON CONFLICT (short_path) em create_url
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS urls_short_path_uniq ON urls(short_path);
+
+-- Paginação por keyset em list_urls
+CREATE INDEX CONCURRENTLY IF NOT EXISTS urls_created_at_id ON urls(created_at DESC, id DESC);
+
+-- Últimos acessos em get_stats sem ordenação em memória; também atende a
+-- busca por url_id do ON DELETE CASCADE
+CREATE INDEX CONCURRENTLY IF NOT EXISTS access_logs_url_ts ON access_logs(url_id, accessed_at DESC);
+
+-- Contagens de acesso por URL lidas por get_stats; atualizada periodicamente
+-- pela aplicação com REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_url_stats AS
+SELECT
+    url_id,
+    COUNT(*) AS total_accesses,
+    COUNT(*) FILTER (WHERE accessed_at >= NOW() - INTERVAL '30 days') AS last_30_days
+FROM access_logs
+GROUP BY url_id;
+
+-- REFRESH ... CONCURRENTLY exige um índice único na view
+CREATE UNIQUE INDEX IF NOT EXISTS mv_url_stats_url_id ON mv_url_stats(url_id);
+
+-- Última atualização de mv_url_stats (uma única linha); evita que cada worker
+-- repita o REFRESH dentro do mesmo intervalo
+CREATE TABLE IF NOT EXISTS mv_url_stats_refreshed_at (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    refreshed_at TIMESTAMPTZ NOT NULL
+);